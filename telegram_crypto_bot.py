@@ -2,12 +2,16 @@ import asyncio
 import logging
 import os
 import re
+import time
+from collections import OrderedDict
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator, Dict, List
+from typing import AsyncGenerator, AsyncIterator, Dict, List, Optional, Tuple
 
 import aiohttp
+import orjson
 from fastapi import FastAPI
-from telegram import Update
+from telegram import Message, Update
+from telegram.error import TelegramError
 from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
 
 # --- Standard Configuration ---
@@ -30,49 +34,327 @@ CHAINS = {
     'hyperliquid': {'name': 'Hyperliquid', 'symbol': 'ETH', 'rpc': 'https://rpc.hyperliquid.xyz/evm'},
     'unichain': {'name': 'Unichain', 'symbol': 'ETH', 'rpc': 'https://mainnet.unichain.org'},
 }
+# Public endpoints are the defaults; set e.g. ETHEREUM_RPC_URL to route a chain through a dedicated provider.
+for chain_id, chain_info in CHAINS.items(): chain_info['rpc'] = os.getenv(f"{chain_id.upper()}_RPC_URL", chain_info['rpc'])
+# Fixed fan-out/reporting order, so tasks and the "no response" list don't rely on dict iteration implicitly.
+CHAIN_IDS = tuple(CHAINS)
 
 # --- Bot Logic (All Functions) ---
-async def get_eth_price(session: aiohttp.ClientSession) -> float:
+# A dead host fails on connect within 3s instead of eating the whole 10s budget.
+HTTP_TIMEOUT = aiohttp.ClientTimeout(total=10, connect=3, sock_read=7)
+# RPC calls fail fast so a stalled chain trips its circuit breaker instead of dragging out the reply.
+RPC_TIMEOUT = aiohttp.ClientTimeout(total=5, connect=2)
+PRICE_CACHE_TTL = 60
+_price_cache = {"value": 0.0, "ts": float('-inf')}  # -inf: monotonic() counts from boot, so 0.0 could look fresh
+_price_task: Optional["asyncio.Task[float]"] = None
+
+async def fetch_eth_price(session: aiohttp.ClientSession) -> float:
     url = "https://api.coingecko.com/api/v3/simple/price"
     params = {"ids": "ethereum", "vs_currencies": "usd"}
     if COINGECKO_API_KEY: params['x_cg_demo_api_key'] = COINGECKO_API_KEY
     headers = {'User-Agent': 'Mozilla/5.0'}
     try:
-        async with session.get(url, params=params, headers=headers, timeout=10) as response:
+        async with session.get(url, params=params, headers=headers, timeout=HTTP_TIMEOUT) as response:
             if response.status == 200:
-                data = await response.json()
+                data = orjson.loads(await response.read())
                 if 'ethereum' in data and 'usd' in data['ethereum']: return data['ethereum']['usd']
-    except Exception as e: logger.error(f"Could not fetch ETH price: {e}")
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e: logger.error(f"Could not fetch ETH price: {e!r}")
     return 0.0
 
-async def get_native_balance(session: aiohttp.ClientSession, rpc_url: str, address: str) -> float:
+async def refresh_eth_price(session: aiohttp.ClientSession) -> float:
+    price = await fetch_eth_price(session)
+    if price > 0: _price_cache.update(value=price, ts=time.monotonic())
+    return price
+
+async def get_eth_price(session: aiohttp.ClientSession) -> float:
+    global _price_task
+    if time.monotonic() - _price_cache["ts"] < PRICE_CACHE_TTL: return _price_cache["value"]
+    # Every caller that misses the cache awaits the same in-flight fetch, so N concurrent /balance calls (even
+    # failing ones) cost one CoinGecko request; shield keeps one caller's cancellation from killing it for the rest.
+    if _price_task is None or _price_task.done(): _price_task = asyncio.create_task(refresh_eth_price(session))
+    return await asyncio.shield(_price_task)
+
+WEI_PER_ETH = 10**18  # balances stay in integer wei until display so summing 1800 of them is exact
+RPC_BATCH_SIZE = 20
+RPC_MIN_BATCH_SIZE = 5
+RPC_MAX_BATCH_SPLITS = 2
+RPC_MAX_RETRIES = 3
+RPC_MAX_RETRY_DELAY = 2.0
+RPC_RESULT_RETRIES = 2
+RPC_RETRY_STATUSES = {429, 500, 502, 503, 504}
+JSON_HEADERS = {'Content-Type': 'application/json'}
+RPC_RATE_LIMIT = 25  # requests/second per RPC host
+# Bounds in-flight POSTs per chain so a 200-address paste doesn't trip public RPC rate limits.
+RPC_SEMAPHORES = {chain_id: asyncio.Semaphore(16) for chain_id in CHAINS}
+
+class TokenBucket:
+    """Paces requests to a host; after a 429 the refill rate is halved for a cool-down window."""
+    def __init__(self, rate: float, cooldown: float = 30.0):
+        self.rate = rate; self.capacity = rate; self.cooldown = cooldown
+        self.tokens = rate; self.updated = time.monotonic(); self.throttled_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def current_rate(self) -> float:
+        return self.rate / 2 if time.monotonic() < self.throttled_until else self.rate
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.current_rate()); self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.current_rate())
+
+    def penalize(self) -> None:
+        self.throttled_until = time.monotonic() + self.cooldown
+
+RPC_BUCKETS = {chain['rpc']: TokenBucket(RPC_RATE_LIMIT) for chain in CHAINS.values()}
+
+def retry_delay(response: aiohttp.ClientResponse, attempt: int) -> float:
+    try: return max(float(response.headers.get('Retry-After', '')), 0.0)
+    except ValueError: return 0.5 * 2 ** attempt
+
+# Per-chain circuit breaker: after CIRCUIT_FAILURE_THRESHOLD consecutive timeouts/connection errors/5xx/429s/bad bodies the
+# chain is skipped for CIRCUIT_OPEN_SECONDS, so one dead endpoint can't hold every /balance reply hostage.
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_OPEN_SECONDS = 30
+_chain_failures: Dict[str, int] = {}
+_chain_open_until: Dict[str, float] = {}
+
+def record_rpc_result(chain_id: str, ok: bool) -> None:
+    if ok:
+        _chain_failures.pop(chain_id, None)
+        return
+    _chain_failures[chain_id] = _chain_failures.get(chain_id, 0) + 1
+    if _chain_failures[chain_id] >= CIRCUIT_FAILURE_THRESHOLD:
+        logger.warning(f"RPC for {chain_id} failed {_chain_failures[chain_id]} times in a row; skipping it for {CIRCUIT_OPEN_SECONDS}s.")
+        _chain_open_until[chain_id] = time.monotonic() + CIRCUIT_OPEN_SECONDS; _chain_failures[chain_id] = 0
+
+def circuit_open(chain_id: str) -> bool:
+    return time.monotonic() < _chain_open_until.get(chain_id, 0.0)
+
+def is_batch_size_error(error: object) -> bool:
+    if not isinstance(error, dict): return False
+    message = str(error.get('message', '')).lower()
+    return error.get('code') == -32600 or 'batch' in message or 'size' in message
+
+async def post_rpc(session: aiohttp.ClientSession, chain_id: str, payload) -> object:
+    rpc_url = CHAINS[chain_id]['rpc']; body = orjson.dumps(payload)  # serialized once, reused on every retry
+    for attempt in range(RPC_MAX_RETRIES + 1):
+        await RPC_BUCKETS[rpc_url].acquire()
+        async with RPC_SEMAPHORES[chain_id]:
+            try:
+                async with session.post(rpc_url, data=body, headers=JSON_HEADERS, timeout=RPC_TIMEOUT) as response:
+                    if response.status == 200:
+                        data = orjson.loads(await response.read())
+                        # Public nodes often rate-limit with a 200 carrying one error object; that is a failure, not a success.
+                        # A batch-size rejection says nothing about the host's health, so it is left out of the count.
+                        error = data.get('error') if isinstance(data, dict) else None
+                        if error is None: record_rpc_result(chain_id, True)
+                        elif not is_batch_size_error(error): record_rpc_result(chain_id, False)
+                        return data
+                    if response.status == 429: RPC_BUCKETS[rpc_url].penalize()
+                    if response.status not in RPC_RETRY_STATUSES or attempt == RPC_MAX_RETRIES:
+                        if response.status >= 500 or response.status in RPC_RETRY_STATUSES: record_rpc_result(chain_id, False)
+                        return None
+                    delay = retry_delay(response, attempt)
+                    if delay > RPC_MAX_RETRY_DELAY:
+                        # Waiting out a long Retry-After would just run into BALANCE_TIMEOUT; slow the host down and give up.
+                        RPC_BUCKETS[rpc_url].penalize(); record_rpc_result(chain_id, False)
+                        return None
+            except (asyncio.TimeoutError, aiohttp.ClientError, ValueError):  # ValueError: a 200 with a non-JSON body
+                record_rpc_result(chain_id, False)
+                raise
+        await asyncio.sleep(delay)
+    return None
+
+async def get_balance_batch(session: aiohttp.ClientSession, chain_id: str, addresses: List[str], splits: int = 0) -> Dict[str, int]:
+    balances = {}
     try:
-        payload = {"jsonrpc": "2.0", "method": "eth_getBalance", "params": [address, "latest"], "id": 1}
-        async with session.post(rpc_url, json=payload, timeout=10) as response:
-            if response.status == 200:
-                data = await response.json()
-                if 'result' in data: return int(data['result'], 16) / 10**18
-    except Exception: pass
-    return 0.0
+        payload = [{"jsonrpc": "2.0", "method": "eth_getBalance", "params": [addr, "latest"], "id": i} for i, addr in enumerate(addresses)]
+        data = await post_rpc(session, chain_id, payload)
+        if isinstance(data, dict) and is_batch_size_error(data.get('error')) and splits < RPC_MAX_BATCH_SPLITS and len(addresses) > RPC_MIN_BATCH_SIZE:
+            # The endpoint refused a batch this size; halve it (at most RPC_MAX_BATCH_SPLITS times) and retry.
+            half = len(addresses) // 2
+            halves = (addresses[:half], addresses[half:])
+            for result in await asyncio.gather(*(get_balance_batch(session, chain_id, part, splits + 1) for part in halves)):
+                balances.update(result)
+            return balances
+        for item in data if isinstance(data, list) else []:
+            idx = item.get('id')
+            if isinstance(idx, int) and 0 <= idx < len(addresses) and 'error' not in item and item.get('result'):
+                balances[addresses[idx]] = int(item['result'], 16)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e: logger.warning(f"eth_getBalance batch failed on {chain_id}: {e!r}")
+    return balances
+
+# Multicall3 is deployed at the same address on every supported chain; one eth_call to its aggregate()
+# runs getEthBalance for a whole chunk of addresses, so endpoints that reject array batches still get one round-trip.
+MULTICALL3_ADDRESS = '0xcA11bde05977b3631167028862bE2a173976CA11'
+MULTICALL_BATCH_SIZE = 500
+AGGREGATE_SELECTOR = '252dba42'  # aggregate((address,bytes)[])
+GET_ETH_BALANCE_SELECTOR = '4d2301cc'  # getEthBalance(address)
+
+def abi_word(value: int) -> str:
+    return f"{value:064x}"
+
+def encode_multicall_eth_balances(addresses: List[str]) -> str:
+    target = abi_word(int(MULTICALL3_ADDRESS, 16)); call_size = 5 * 32  # target, bytes offset, bytes length, 36 bytes padded to 64
+    offsets = [abi_word(len(addresses) * 32 + i * call_size) for i in range(len(addresses))]
+    calls = [target + abi_word(0x40) + abi_word(36) + GET_ETH_BALANCE_SELECTOR + addr[2:].rjust(64, '0') + '0' * 56 for addr in addresses]
+    return '0x' + AGGREGATE_SELECTOR + abi_word(0x20) + abi_word(len(addresses)) + ''.join(offsets) + ''.join(calls)
+
+def decode_multicall_eth_balances(result: str, count: int) -> List[int]:
+    data = bytes.fromhex(result[2:])
+    word = lambda offset: int.from_bytes(data[offset:offset + 32], 'big')
+    array_start = word(32)  # returns (uint256 blockNumber, bytes[] returnData)
+    if word(array_start) != count: raise ValueError(f"expected {count} results, got {word(array_start)}")
+    items = array_start + 32
+    return [word(items + word(items + 32 * i) + 32) for i in range(count)]
+
+DECODE_OFFLOAD_THRESHOLD = 200
+# Chains whose eth_call came back empty ('0x' = no contract code); they go straight to eth_getBalance batches.
+_multicall_unsupported = set()
+
+async def get_multicall_balances(session: aiohttp.ClientSession, chain_id: str, addresses: List[str]) -> Optional[Dict[str, int]]:
+    try:
+        call = {"to": MULTICALL3_ADDRESS, "data": encode_multicall_eth_balances(addresses)}
+        data = await post_rpc(session, chain_id, {"jsonrpc": "2.0", "method": "eth_call", "params": [call, "latest"], "id": 1})
+        if isinstance(data, dict) and data.get('result') == '0x':
+            logger.warning(f"Multicall3 is not deployed on {chain_id}; using eth_getBalance batches from now on.")
+            _multicall_unsupported.add(chain_id)
+        elif isinstance(data, dict) and data.get('result'):
+            # Large responses are decoded off the event loop so Telegram updates keep flowing meanwhile.
+            if len(addresses) >= DECODE_OFFLOAD_THRESHOLD:
+                balances = await asyncio.get_running_loop().run_in_executor(None, decode_multicall_eth_balances, data['result'], len(addresses))
+            else: balances = decode_multicall_eth_balances(data['result'], len(addresses))
+            return dict(zip(addresses, balances))
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e: logger.warning(f"Multicall3 lookup failed on {chain_id}: {e!r}")
+    return None
+
+async def fetch_chain_balances(session: aiohttp.ClientSession, chain_id: str, addresses: List[str]) -> Dict[str, int]:
+    balances = {}; fallback = []
+    if chain_id in _multicall_unsupported: fallback = addresses
+    else:
+        chunks = [addresses[i:i + MULTICALL_BATCH_SIZE] for i in range(0, len(addresses), MULTICALL_BATCH_SIZE)]
+        for chunk, result in zip(chunks, await asyncio.gather(*(get_multicall_balances(session, chain_id, chunk) for chunk in chunks))):
+            if result is None: fallback.extend(chunk)
+            else: balances.update(result)
+    # Chunks the multicall couldn't answer fall back to plain JSON-RPC eth_getBalance batches; addresses that
+    # still come back empty (transient errors) get a couple of short-backoff retries before the chain is reported as missing.
+    pending = fallback
+    for attempt in range(RPC_RESULT_RETRIES + 1):
+        if attempt: await asyncio.sleep(0.25 * attempt)
+        batches = [pending[i:i + RPC_BATCH_SIZE] for i in range(0, len(pending), RPC_BATCH_SIZE)]
+        for result in await asyncio.gather(*(get_balance_batch(session, chain_id, batch) for batch in batches)): balances.update(result)
+        pending = [addr for addr in pending if addr not in balances]
+        if not pending or circuit_open(chain_id): break
+    return balances
+
+BALANCE_CACHE_TTL = 5
+BALANCE_CACHE_MAX = 10_000
+# (chain_id, address) -> (balance, fetched_at); kept in LRU order. Block times make a few seconds of staleness harmless.
+_balance_cache: "OrderedDict[Tuple[str, str], Tuple[int, float]]" = OrderedDict()
+
+def cache_balance(chain_id: str, address: str, balance: int, now: float) -> None:
+    key = (chain_id, address)
+    _balance_cache[key] = (balance, now); _balance_cache.move_to_end(key)
+    while len(_balance_cache) > BALANCE_CACHE_MAX: _balance_cache.popitem(last=False)
+
+# (chain_id, address) -> future resolved by whichever command is already fetching it; None means the lookup failed.
+_inflight: Dict[Tuple[str, str], "asyncio.Future[Optional[int]]"] = {}
+
+async def fetch_owned_balances(session: aiohttp.ClientSession, chain_id: str, addresses: List[str]) -> Dict[str, int]:
+    if not addresses: return {}
+    loop = asyncio.get_running_loop(); owned = {addr: loop.create_future() for addr in addresses}
+    for addr, fut in owned.items(): _inflight[(chain_id, addr)] = fut
+    try:
+        result = await fetch_chain_balances(session, chain_id, addresses)
+        fetched_at = time.monotonic()
+        for addr, balance in result.items(): cache_balance(chain_id, addr, balance, fetched_at); owned[addr].set_result(balance)
+        return result
+    finally:
+        for addr, fut in owned.items():
+            if not fut.done(): fut.set_result(None)
+            if _inflight.get((chain_id, addr)) is fut: del _inflight[(chain_id, addr)]
+
+async def get_balances_for_chain(session: aiohttp.ClientSession, chain_id: str, addresses: List[str]) -> Optional[List[int]]:
+    hot = {}; pending = addresses
+    # If the owner of a shared lookup failed or was cancelled (e.g. hit its own deadline), its addresses go back through
+    # the cache/in-flight check, so concurrent waiters re-coalesce onto one refetch instead of each starting their own.
+    while pending:
+        now = time.monotonic(); cold = []; shared = {}
+        for addr in pending:
+            cached = _balance_cache.get((chain_id, addr))
+            if cached and now - cached[1] < BALANCE_CACHE_TTL: hot[addr] = cached[0]; _balance_cache.move_to_end((chain_id, addr))
+            elif (chain_id, addr) in _inflight: shared[addr] = _inflight[(chain_id, addr)]
+            else: cold.append(addr)
+        hot.update(await fetch_owned_balances(session, chain_id, cold))  # addresses we fetched ourselves are final
+        results = await asyncio.gather(*(asyncio.shield(fut) for fut in shared.values()))
+        pending = [addr for addr, balance in zip(shared.keys(), results) if balance is None]
+        hot.update((addr, balance) for addr, balance in zip(shared.keys(), results) if balance is not None)
+    # Addresses still unresolved (retries exhausted, or the breaker opened mid-fetch) mean the chain's total would be
+    # understated; report the chain as not responding rather than passing off the gaps as empty wallets.
+    unresolved = sum(1 for addr in addresses if addr not in hot)
+    if unresolved:
+        logger.warning(f"{unresolved}/{len(addresses)} balances unresolved on {chain_id}; reporting it as not responding.")
+        return None
+    return [hot[addr] for addr in addresses]  # index-aligned with addresses
 
-async def get_balances_for_chain(session: aiohttp.ClientSession, chain_id: str, addresses: List[str]) -> Dict[str, float]:
-    rpc_url = CHAINS[chain_id]['rpc']
-    tasks = {addr: get_native_balance(session, rpc_url, addr) for addr in addresses}
-    balances = await asyncio.gather(*tasks.values())
-    return {addr: balance for addr, balance in zip(tasks.keys(), balances)}
+BALANCE_TIMEOUT = 30
 
-async def get_all_balances(session: aiohttp.ClientSession, addresses: List[str]) -> Dict[str, Dict[str, float]]:
-    tasks = {chain_id: get_balances_for_chain(session, chain_id, addresses) for chain_id in CHAINS.keys()}
-    results = await asyncio.gather(*tasks.values())
-    return {chain_id: result for chain_id, result in zip(tasks.keys(), results)}
+async def get_chain_entry(session: aiohttp.ClientSession, chain_id: str, addresses: List[str]) -> Tuple[str, Optional[List[int]]]:
+    # A failing chain must not take the other chains down with it, so errors are logged and reported as None.
+    if circuit_open(chain_id): return chain_id, None
+    try: return chain_id, await get_balances_for_chain(session, chain_id, addresses)
+    except Exception as e:
+        logger.error(f"Balance lookup failed on {chain_id}: {e}")
+        return chain_id, None
+
+async def stream_all_balances(session: aiohttp.ClientSession, addresses: List[str]) -> AsyncIterator[Tuple[str, List[int]]]:
+    # Yields chains in completion order; failed chains and anything still pending after BALANCE_TIMEOUT are left out.
+    tasks = [asyncio.create_task(get_chain_entry(session, chain_id, addresses)) for chain_id in CHAIN_IDS]
+    try:
+        for next_done in asyncio.as_completed(tasks, timeout=BALANCE_TIMEOUT):
+            try: chain_id, balances = await next_done
+            except asyncio.TimeoutError:
+                logger.warning(f"Balance lookup timed out after {BALANCE_TIMEOUT}s; returning partial results.")
+                break
+            if balances is not None: yield chain_id, balances
+    finally:
+        for task in tasks: task.cancel()
+
+# Anchored so the first 40 hex chars of a tx hash or other longer hex blob aren't mistaken for an address.
+ADDRESS_RE = re.compile(r'(?<![0-9a-zA-Z])0x[a-fA-F0-9]{40}(?![0-9a-zA-Z])')
 
 def parse_addresses(text: str) -> List[str]:
-    address_pattern = r'0x[a-fA-F0-9]{40}'
-    return list(dict.fromkeys(addr.lower() for addr in re.findall(address_pattern, text)))
+    seen = set(); addresses = []
+    for match in ADDRESS_RE.finditer(text):
+        addr = match.group(0).lower()
+        if addr not in seen: seen.add(addr); addresses.append(addr)
+    return addresses
 
-async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handles the /start command with the new, detailed welcome message."""
-    welcome_message = """
+PROGRESS_EDIT_INTERVAL = 2.0
+
+def format_balance_summary(address_count: int, chain_totals: Dict[str, int], eth_price: float) -> str:
+    asset_totals = {}; chain_breakdown = []
+    for chain_id, chain_total_wei in chain_totals.items():
+        chain_info = CHAINS[chain_id]; symbol = chain_info['symbol']; chain_total = chain_total_wei / WEI_PER_ETH
+        if chain_total > 0.000001: chain_breakdown.append(f"• **{chain_info['name']}:** {chain_total:.6f} {symbol}")
+        if symbol not in asset_totals: asset_totals[symbol] = 0
+        asset_totals[symbol] += chain_total
+    
+    parts = [f"📊 **Balance Summary for {address_count} addresses:**", ""]
+    parts.extend(sorted(chain_breakdown) or ["No balances found on any supported chain."])
+    parts.append("")
+    parts.extend(f"🎯 **TOTAL {symbol}:** {total:.6f} {symbol}" for symbol, total in sorted(asset_totals.items()) if total > 0.000001)
+    if 'ETH' in asset_totals and asset_totals['ETH'] > 0 and eth_price > 0:
+        usd_value = asset_totals['ETH'] * eth_price
+        parts.append(f"💰 **ETH USD Value:** `${usd_value:,.2f}` (at `${eth_price:,.2f}/ETH`)")
+    return "\n".join(parts)
+
+WELCOME_MESSAGE = """
 🤖 **Crypto Balance Bot**
 
 I can help you check ETH balances across multiple EVM chains!
@@ -100,7 +382,14 @@ I can help you check ETH balances across multiple EVM chains!
 0x742d35Cc6634C0532925a3b8D5C9E49C7F59c2c4
 0xd8dA6BF26964aF9D7eEd9e03E53415D37aA96045
 """
-    await update.message.reply_text(welcome_message, parse_mode='Markdown')
+
+async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handles the /start command with the new, detailed welcome message."""
+    await update.message.reply_text(WELCOME_MESSAGE, parse_mode='Markdown')
+
+# chat_id -> lock, plus how many handlers currently hold or wait on it; entries are dropped when that reaches 0.
+_chat_locks: Dict[int, asyncio.Lock] = {}
+_chat_lock_users: Dict[int, int] = {}
 
 async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """This function is triggered by any non-command text message."""
@@ -109,30 +398,48 @@ async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("I didn't find any valid wallet addresses in your message. Use /start to see instructions and an example.")
         return
     
-    await context.bot.send_chat_action(chat_id=update.effective_chat.id, action='typing')
+    # Updates are processed concurrently, but one chat's pastes run one at a time: a repeat waits for the first,
+    # then mostly hits the balance cache instead of firing a second 9-chain fan-out.
+    chat_id = update.effective_chat.id
+    lock = _chat_locks.setdefault(chat_id, asyncio.Lock()); _chat_lock_users[chat_id] = _chat_lock_users.get(chat_id, 0) + 1
+    try:
+        async with lock: await reply_with_balances(update, context, addresses)
+    finally:
+        _chat_lock_users[chat_id] -= 1
+        if not _chat_lock_users[chat_id]: del _chat_lock_users[chat_id]; del _chat_locks[chat_id]
+
+async def reply_with_balances(update: Update, context: ContextTypes.DEFAULT_TYPE, addresses: List[str]):
+    session = context.bot_data['http_session']
+    price_task = asyncio.create_task(get_eth_price(session))
+    status_message = await update.message.reply_text(f"⏳ Checking {len(addresses)} addresses across {len(CHAIN_IDS)} chains...")
     
-    async with aiohttp.ClientSession() as session:
-        balance_task = get_all_balances(session, addresses); price_task = get_eth_price(session)
-        all_balances, eth_price = await asyncio.gather(balance_task, price_task)
+    chain_totals = {}; last_edit = float('-inf')  # the first chain to finish is shown right away
+    async for chain_id, balances in stream_all_balances(session, addresses):
+        chain_totals[chain_id] = sum(balances)  # summed once here, reused by every render below
+        if len(chain_totals) < len(CHAIN_IDS) and time.monotonic() - last_edit >= PROGRESS_EDIT_INTERVAL:
+            last_edit = time.monotonic()
+            progress_message = format_balance_summary(len(addresses), chain_totals, 0.0) + f"\n\n⏳ {len(chain_totals)}/{len(CHAIN_IDS)} chains checked..."
+            try: await status_message.edit_text(progress_message, parse_mode='Markdown')
+            except TelegramError as e: logger.warning(f"Could not update progress message: {e}")
     
-    asset_totals = {}; chain_breakdown = []
-    for chain_id, balances in all_balances.items():
-        chain_info = CHAINS[chain_id]; symbol = chain_info['symbol']; chain_total = sum(balances.values())
-        if chain_total > 0.000001: chain_breakdown.append(f"• **{chain_info['name']}:** {chain_total:.6f} {symbol}")
-        if symbol not in asset_totals: asset_totals[symbol] = 0
-        asset_totals[symbol] += chain_total
-    
-    result_message = f"📊 **Balance Summary for {len(addresses)} addresses:**\n\n"
-    if chain_breakdown: result_message += "\n".join(sorted(chain_breakdown))
-    else: result_message += "No balances found on any supported chain."
-    result_message += "\n\n"
-    for symbol, total in sorted(asset_totals.items()):
-        if total > 0.000001: result_message += f"🎯 **TOTAL {symbol}:** {total:.6f} {symbol}\n"
-    if 'ETH' in asset_totals and asset_totals['ETH'] > 0 and eth_price > 0:
-        usd_value = asset_totals['ETH'] * eth_price
-        result_message += f"💰 **ETH USD Value:** `${usd_value:,.2f}` (at `${eth_price:,.2f}/ETH`)"
-    
-    await update.message.reply_text(result_message, parse_mode='Markdown')
+    missing = [CHAINS[chain_id]['name'] for chain_id in CHAIN_IDS if chain_id not in chain_totals]
+    warning = f"\n⚠️ No response from: {', '.join(missing)}" if missing else ""
+    balance_message = None
+    if not price_task.done():
+        # Don't hold the balances back for CoinGecko; the USD line is added once the price arrives.
+        balance_message = format_balance_summary(len(addresses), chain_totals, 0.0) + warning
+        status_message = await show_result(update, status_message, balance_message)
+    result_message = format_balance_summary(len(addresses), chain_totals, await price_task) + warning
+    if result_message != balance_message: await show_result(update, status_message, result_message)
+
+async def show_result(update: Update, status_message: Message, text: str) -> Message:
+    # Several edits per /balance make flood control more likely; never leave the user on a stale "⏳" message.
+    try:
+        await status_message.edit_text(text, parse_mode='Markdown')
+        return status_message
+    except TelegramError as e:
+        logger.warning(f"Could not edit status message, sending a new one: {e}")
+        return await update.message.reply_text(text, parse_mode='Markdown')
 
 # --- LIFESPAN MANAGER TO START/STOP THE BOT ---
 @asynccontextmanager
@@ -142,21 +449,30 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         yield
         return
     
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+    application = Application.builder().token(TELEGRAM_TOKEN).concurrent_updates(True).build()
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, balance_command))
     
-    await application.initialize()
-    await application.start()
-    await application.updater.start_polling(drop_pending_updates=True)
-    logger.info("Telegram bot has started successfully.")
-    
-    yield
-    
-    await application.updater.stop()
-    await application.stop()
-    await application.shutdown()
-    logger.info("Telegram bot has been shut down.")
+    # One pooled session for the bot's lifetime so RPC/CoinGecko connections stay warm between commands.
+    # Per-chain pacing is handled by RPC_SEMAPHORES and RPC_BUCKETS; the pool just keeps DNS and keep-alive connections warm.
+    connector = aiohttp.TCPConnector(limit=200, limit_per_host=20, use_dns_cache=True, ttl_dns_cache=300,
+                                     keepalive_timeout=75, force_close=False, enable_cleanup_closed=True)
+    session = aiohttp.ClientSession(connector=connector)
+    application.bot_data['http_session'] = session
+    try:
+        await application.initialize()
+        await application.start()
+        await application.updater.start_polling(drop_pending_updates=True)
+        logger.info("Telegram bot has started successfully.")
+        
+        yield
+        
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+        logger.info("Telegram bot has been shut down.")
+    finally:
+        await session.close()
 
 # --- WEB SERVER SETUP ---
 web_app = FastAPI(lifespan=lifespan)